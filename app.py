@@ -1,156 +1,249 @@
 import streamlit as st
-import joblib
+import numpy as np
 import pandas as pd
 
 # 1. Charger le modèle (Le Cerveau)
 # On utilise @st.cache_resource pour que le site ne recharge pas le modèle à chaque clic
 # Ça rend l'app beaucoup plus rapide.
+# Le cache est partagé par tous les visiteurs du serveur (un seul processus Streamlit),
+# et Streamlit verrouille le premier chargement : il n'y a qu'une copie du modèle en RAM.
+# Le fichier est déjà compressé (zlib) : moins d'octets à lire au démarrage.
+# Pas de mmap_mode='r' ici : joblib l'ignore sur un fichier compressé, et de toute façon
+# scikit-learn recopie les tableaux de chaque arbre en mémoire au chargement.
+CHEMIN_MODELE = 'mon_super_modele.pkl'
+
 @st.cache_resource
 def load_model():
-    return joblib.load('mon_super_modele.pkl')
+    # joblib ne sert qu'à charger le modèle : on l'importe ici, comme scikit-learn
+    # dans les fonctions du labo (qui n'est importé que si on ouvre le labo)
+    import joblib
+
+    return joblib.load(CHEMIN_MODELE)
 
 model = load_model()
 
+# Les constantes sont créées une fois en haut du script (des tuples, qu'on ne modifie jamais),
+# pas à chaque clic sur le bouton.
+# L'ordre des colonnes utilisé lors de l'entraînement (il doit rester IDENTIQUE)
+COLONNES_MODELE = ('MedInc', 'HouseAge', 'AveRooms', 'AveBedrms', 'Population', 'AveOccup', 'Latitude', 'Longitude')
+# Les mêmes critères, mais avec des noms lisibles pour le graphique
+FEATURE_NAMES = ('Revenu', 'Âge', 'Pièces', 'Chambres', 'Population', 'Occupants', 'Latitude', 'Longitude')
+# Prix moyen dans le dataset original (environ 206k)
+PRIX_MOYEN_CA = 206_855
+
+# predire_prix() ne passe pas par model.predict(), donc scikit-learn ne vérifie plus les noms
+# des colonnes à chaque clic : on vérifie nous-mêmes, une seule fois, que l'ordre est le bon.
+if tuple(model.feature_names_in_) != COLONNES_MODELE:
+    st.error(f"Le modèle attend les colonnes {list(model.feature_names_in_)}, pas {list(COLONNES_MODELE)}.")
+    st.stop()
+
+# L'importance des critères ne dépend que du modèle : on la calcule une seule fois.
+# Le "_" devant _model dit à Streamlit de ne pas essayer de hacher le Random Forest.
+@st.cache_data
+def get_importance_df(_model):
+    # On récupère l'importance de chaque critère (c'est un % calculé par le Random Forest)
+    importance = _model.feature_importances_
+
+    # On crée un tableau propre pour l'affichage, trié du plus important au moins important
+    return pd.DataFrame({
+        'Critère': FEATURE_NAMES,
+        'Importance': importance
+    }).set_index('Critère').sort_values(by='Importance', ascending=False)
+
+# Les arbres de la forêt, sortis une seule fois du modèle.
+# Chaque tree_ est le vrai arbre compilé (en Cython) de scikit-learn.
+@st.cache_resource
+def get_arbres(_model):
+    return tuple(arbre.tree_ for arbre in _model.estimators_)
+
+# Pour une seule maison, model.predict() passe surtout son temps à vérifier l'entrée
+# et à répartir le travail entre les arbres (~4 ms). On parcourt directement chaque arbre
+# compilé et on fait la moyenne, exactement comme le Random Forest (~0.15 ms).
+# La ligne doit être un tableau float32 dans l'ordre de COLONNES_MODELE.
+def predire_prix(ligne):
+    arbres = get_arbres(model)
+    return sum(arbre.predict(ligne)[0, 0] for arbre in arbres) / len(arbres)
+
+# On prépare une seule fois la ligne envoyée au modèle, puis on la remplit à chaque clic.
+# On la range dans st.session_state pour que chaque visiteur ait sa propre ligne.
+# En float32 : c'est le type que les arbres de scikit-learn utilisent pour parcourir X.
+if 'ligne_modele' not in st.session_state:
+    st.session_state.ligne_modele = np.empty((1, len(COLONNES_MODELE)), dtype=np.float32)
+
+# Les données brutes du laboratoire : téléchargées une seule fois, puis gardées sur le disque
+# (persist="disk"), donc elles survivent même à un redémarrage de l'app.
+@st.cache_data(persist="disk")
+def load_housing():
+    from sklearn.datasets import fetch_california_housing
+
+    data = fetch_california_housing()
+    return pd.DataFrame(data.data, columns=data.feature_names), data.target
+
+# Le découpage entraînement / test ne change que si on change la graine (seed)
+# On le garde en tableaux NumPy float32 : le type que les arbres utilisent, et deux fois moins de RAM.
+# (les prix Y restent en float64 : scikit-learn les convertirait de toute façon)
+@st.cache_data
+def get_split(seed):
+    from sklearn.model_selection import train_test_split
+
+    X, Y = load_housing()
+    return train_test_split(X.to_numpy(dtype=np.float32), Y, test_size=0.2, random_state=seed)
+
+# Un modèle entraîné avec les mêmes réglages est gardé en mémoire :
+# relancer l'expérience avec les mêmes curseurs est alors instantané.
+# Ce cache est partagé par tous les visiteurs : on n'y garde que les derniers modèles
+# (max_entries) pour que la RAM ne grossisse pas à chaque nouveau réglage essayé.
+@st.cache_resource(max_entries=5)
+def train_lab(algo, n_arbres, profondeur, seed=42):
+    from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+
+    X_train, X_test, Y_train, Y_test = get_split(seed)
+    if algo == "HistGBR":
+        # Le Gradient Boosting "par histogrammes" range chaque critère dans 256 cases :
+        # beaucoup plus rapide à entraîner qu'une forêt sur un tableau de cette taille.
+        # early_stopping=False : sinon, au-delà de 10 000 lignes, scikit-learn garde 10 % des données
+        # de côté et peut s'arrêter avant max_iter (le curseur "Nombre d'arbres" ne servirait plus à rien)
+        lab_model = HistGradientBoostingRegressor(max_iter=n_arbres, max_depth=profondeur, early_stopping=False, random_state=seed)
+    else:
+        # n_jobs=-1 : on construit les arbres en parallèle sur tous les cœurs
+        lab_model = RandomForestRegressor(n_estimators=n_arbres, max_depth=profondeur, n_jobs=-1, random_state=seed)
+    lab_model.fit(X_train, Y_train)
+    return lab_model, X_test, Y_test
+
 # 2. L'Interface (Le Visuel)
 st.title("🏡 Estimateur de Prix Immobilier (Californie)")
 st.write("Entrez les caractéristiques de la maison pour obtenir une estimation.")
 
-# On divise l'écran en 2 colonnes pour faire joli
-col1, col2 = st.columns(2)
+# Tout le panneau de saisie est un fragment : changer un champ ne relance que ce panneau
+# (les champs, la carte et l'estimation), pas la page entière ni le labo.
+# Les nombres sont validés quand on quitte le champ (ou avec Entrée), les curseurs quand on les lâche.
+@st.fragment
+def inputs_fragment():
+    # On divise l'écran en 2 colonnes pour faire joli
+    col1, col2 = st.columns(2)
 
-with col1:
-    med_inc = st.number_input("Revenu Médian du quartier (en 10k$)", value=5.0, step=0.1)
-    house_age = st.slider("Âge de la maison (années)", 1, 50, 20)
-    ave_rooms = st.number_input("Nombre moyen de pièces", value=6.0, step=0.5)
-    ave_bedrms = st.number_input("Nombre moyen de chambres", value=1.0, step=0.1)
+    with col1:
+        med_inc = st.number_input("Revenu Médian du quartier (en 10k$)", value=5.0, step=0.1)
+        house_age = st.slider("Âge de la maison (années)", 1, 50, 20)
+        ave_rooms = st.number_input("Nombre moyen de pièces", value=6.0, step=0.5)
+        ave_bedrms = st.number_input("Nombre moyen de chambres", value=1.0, step=0.1)
 
-with col2:
-    population = st.number_input("Population du quartier", value=1000, step=100)
-    ave_occup = st.number_input("Occupants par maison", value=3.0, step=0.1)
-    latitude = st.number_input("Latitude (Ex: 34.0 LA / 37.7 SF)", value=37.7)
-    longitude = st.number_input("Longitude (Ex: -118.2 LA / -122.4 SF)", value=-122.4)
+    with col2:
+        population = st.number_input("Population du quartier", value=1000, step=100)
+        ave_occup = st.number_input("Occupants par maison", value=3.0, step=0.1)
+        latitude = st.number_input("Latitude (Ex: 34.0 LA / 37.7 SF)", value=37.7)
+        longitude = st.number_input("Longitude (Ex: -118.2 LA / -122.4 SF)", value=-122.4)
 
-# On sort de la colonne (reviens tout à gauche, sans espace au début de la ligne)
-st.write("---") # Une petite ligne de séparation esthétique
-st.subheader("📍 Localisation du bien")
+    # On sort des colonnes
+    st.write("---") # Une petite ligne de séparation esthétique
+    st.subheader("📍 Localisation du bien")
 
-# On crée les données pour la carte avec les variables que l'utilisateur vient de choisir
-map_data = pd.DataFrame({'lat': [latitude], 'lon': [longitude]})
+    # On crée les données pour la carte avec les variables que l'utilisateur vient de choisir
+    map_data = pd.DataFrame({'lat': [latitude], 'lon': [longitude]})
 
-# On affiche la carte
-st.map(map_data, zoom=10)
-# --- FIN DE TON AJOUT ---
+    # On affiche la carte (elle est renvoyée à chaque fois que le panneau de saisie est relancé)
+    st.map(map_data, zoom=10)
+
+    predict_fragment((med_inc, house_age, ave_rooms, ave_bedrms, population, ave_occup, latitude, longitude))
 
 # 3. La Prédiction (L'Action)
-if st.button("💰 Estimer le Prix"):
-    # On doit recréer exactement la même structure que lors de l'entraînement
-    # Les noms des colonnes doivent être IDENTIQUES
-    features = pd.DataFrame({
-        'MedInc': [med_inc],
-        'HouseAge': [house_age],
-        'AveRooms': [ave_rooms],
-        'AveBedrms': [ave_bedrms],
-        'Population': [population],
-        'AveOccup': [ave_occup],
-        'Latitude': [latitude],
-        'Longitude': [longitude]
-    })
-
-    prediction = model.predict(features)
-    
-    # Le prix est en centaines de milliers de dollars dans le dataset (ex: 2.5 = 250k)
-    prix_final = prediction[0] * 100000 
-    
-    # Prix moyen dans le dataset original (environ 206k)
-    prix_moyen_californie = 206855 
-    delta = prix_final - prix_moyen_californie
-
-    col_resultat, col_vide = st.columns(2)
-    
-    with col_resultat:
-        st.metric(
-            label="Prix Estimé", 
-            value=f"{prix_final:,.0f} $", 
-            delta=f"{delta:,.0f} $ vs Moyenne",
-            delta_color="inverse" # Rouge si cher, Vert si pas cher
-        )
-    # ... après st.success(...)
+# Le bouton vit dans son propre "fragment" (dans celui des champs) : cliquer dessus
+# ne relance que ce bloc, pas la carte ni les champs.
+# Si on change un champ, le panneau entier est relancé et l'ancienne estimation disparaît.
+@st.fragment
+def predict_fragment(valeurs):
+    if st.button("💰 Estimer le Prix"):
+        # On remplit la ligne préparée, dans le même ordre que COLONNES_MODELE
+        ligne = st.session_state.ligne_modele
+        ligne[0, :] = valeurs
+
+        prediction = predire_prix(ligne)
+        
+        # Le prix est en centaines de milliers de dollars dans le dataset (ex: 2.5 = 250k)
+        prix_final = prediction * 100000 
+        
+        # Écart avec le prix moyen en Californie (voir PRIX_MOYEN_CA)
+        delta = prix_final - PRIX_MOYEN_CA
 
-    st.subheader("🔍 Comprendre la décision")
-    
-    # On récupère l'importance de chaque critère (c'est un % calculé par le Random Forest)
-    importance = model.feature_importances_
-    
-    # On crée un tableau propre pour l'affichage
-    feature_names = ['Revenu', 'Âge', 'Pièces', 'Chambres', 'Population', 'Occupants', 'Latitude', 'Longitude']
-    df_importance = pd.DataFrame({
-        'Critère': feature_names,
-        'Importance': importance
-    }).set_index('Critère')
-
-    # On trie du plus important au moins important
-    df_importance = df_importance.sort_values(by='Importance', ascending=False)
-
-    # On affiche le graphique à barres
-    st.bar_chart(df_importance)
-    # --- AJOUT À LA FIN DU FICHIER app.py ---
-    st.sidebar.markdown("---")
-    st.sidebar.header("🧪 Zone Laboratoire")
-    show_lab = st.sidebar.checkbox("Afficher le mode Expérimental")
-    
-    if show_lab:
-        st.markdown("---")
-        st.header("🧪 Laboratoire d'Entraînement")
-        st.write("Ici, on entraîne un nouveau modèle en direct pour comprendre l'impact des paramètres.")
-    
-        # 1. Chargement des données brutes (pour l'expérience)
-        from sklearn.datasets import fetch_california_housing
-        from sklearn.model_selection import train_test_split
-        from sklearn.ensemble import RandomForestRegressor
-        from sklearn.linear_model import LinearRegression
-        import matplotlib.pyplot as plt
+        col_resultat, col_vide = st.columns(2)
+        
+        with col_resultat:
+            st.metric(
+                label="Prix Estimé", 
+                value=f"{prix_final:,.0f} $", 
+                delta=f"{delta:,.0f} $ vs Moyenne",
+                delta_color="inverse" # Rouge si cher, Vert si pas cher
+            )
+        # ... après st.success(...)
+
+        st.subheader("🔍 Comprendre la décision")
         
-        data = fetch_california_housing()
-        X = pd.DataFrame(data.data, columns=data.feature_names)
-        Y = data.target
-    
-        # 2. Les Réglages (Hyperparamètres)
-        col_param1, col_param2 = st.columns(2)
-        with col_param1:
-            n_arbres = st.slider("Nombre d'arbres (n_estimators)", 10, 100, 30)
-        with col_param2:
-            profondeur = st.slider("Profondeur max (max_depth)", 1, 20, 5)
-    
-        # 3. Bouton pour lancer l'entraînement
-        if st.button("Lancer l'expérience"):
-            # Split
-            X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, random_state=42)
-            
-            # Entraînement
-            with st.spinner('L\'IA retourne à l\'école...'):
-                lab_model = RandomForestRegressor(n_estimators=n_arbres, max_depth=profondeur)
-                lab_model.fit(X_train, Y_train)
-                score = lab_model.score(X_test, Y_test) # Le R² (1.0 est parfait, 0 est nul)
-            
-            st.success(f"Score de précision (R²) : {score:.2f}")
-    
-            # 4. Le Graphique de Vérité (Réalité vs Prédiction)
-            preds = lab_model.predict(X_test)
-            
-            fig, ax = plt.subplots()
-            ax.scatter(Y_test, preds, alpha=0.5, color='blue', s=5)
-            ax.plot([Y.min(), Y.max()], [Y.min(), Y.max()], 'r--', lw=2) # La ligne parfaite
-            ax.set_xlabel('Vrai Prix')
-            ax.set_ylabel('Prix Prédit')
-            ax.set_title('Si les points sont sur la ligne rouge, c\'est parfait.')
-            
-            st.pyplot(fig)
-            
-            st.write("""
-            **Comment lire ce graphique ?**
-            - **Axe X** : Le prix réel de la maison.
-            - **Axe Y** : Le prix deviné par l'IA.
-            - **Ligne Rouge** : La perfection.
-            - **Nuage de points** : Si le nuage est compact autour de la ligne, le modèle est bon. S'il est dispersé, le modèle hésite.
-            """)
+        # Le tableau trié est gardé en cache (voir get_importance_df)
+        df_importance = get_importance_df(model)
+
+        # On affiche le graphique à barres
+        st.bar_chart(df_importance)
+
+# On lance le panneau principal (une fois que toutes les fonctions ci-dessus existent)
+inputs_fragment()
+
+# 4. Le Laboratoire (La Zone Expérimentale)
+st.sidebar.markdown("---")
+st.sidebar.header("🧪 Zone Laboratoire")
+show_lab = st.sidebar.checkbox("Afficher le mode Expérimental")
+
+# Même principe : bouger un curseur ou lancer l'expérience ne relance que le labo
+@st.fragment
+def lab_fragment():
+    st.markdown("---")
+    st.header("🧪 Laboratoire d'Entraînement")
+    st.write("Ici, on entraîne un nouveau modèle en direct pour comprendre l'impact des paramètres.")
+
+    # 1. Les Réglages (Hyperparamètres)
+    algo = st.radio("Modèle", ["RandomForest", "HistGBR"], horizontal=True)
+    col_param1, col_param2 = st.columns(2)
+    with col_param1:
+        n_arbres = st.slider("Nombre d'arbres (n_estimators)", 10, 100, 30)
+    with col_param2:
+        profondeur = st.slider("Profondeur max (max_depth)", 1, 20, 5)
+
+    # 2. Bouton pour lancer l'entraînement
+    if st.button("Lancer l'expérience"):
+        # Split + Entraînement (gardés en cache, voir train_lab)
+        with st.spinner('L\'IA retourne à l\'école...'):
+            lab_model, X_test, Y_test = train_lab(algo, n_arbres, profondeur)
+            score = lab_model.score(X_test, Y_test) # Le R² (1.0 est parfait, 0 est nul)
+        
+        st.success(f"Score de précision (R²) : {score:.2f}")
 
+        # 3. Le Graphique de Vérité (Réalité vs Prédiction)
+        preds = lab_model.predict(X_test)
+        
+        # Graphique natif de Streamlit : c'est le navigateur qui dessine les points,
+        # le serveur n'a plus besoin de fabriquer une image avec matplotlib.
+        # La ligne parfaite (prédit = réel) est une deuxième série, en rouge.
+        chart_df = pd.DataFrame({
+            'Vrai Prix': Y_test,
+            'Prix Prédit': preds,
+            'Ligne parfaite': Y_test
+        })
+        st.caption('Si les points sont sur la ligne rouge, c\'est parfait.')
+        st.scatter_chart(
+            chart_df,
+            x='Vrai Prix',
+            y=['Prix Prédit', 'Ligne parfaite'],
+            color=['#0000FF', '#FF0000'],
+            size=5,
+            y_label='Prix Prédit'
+        )
+        
+        st.write("""
+        **Comment lire ce graphique ?**
+        - **Axe X** : Le prix réel de la maison.
+        - **Axe Y** : Le prix deviné par l'IA.
+        - **Ligne Rouge** : La perfection.
+        - **Nuage de points** : Si le nuage est compact autour de la ligne, le modèle est bon. S'il est dispersé, le modèle hésite.
+        """)
+
+if show_lab:
+    lab_fragment()